@@ -8,17 +8,31 @@ Google Cloud Platform.  It is built on several Google components:
   encryption/decryption
 * Google IAM - Manages who gets access to what.
 
-The design makes no assumptions as to the internal structure of the secret.
-However, because of the limitations of Google KMS, the secret should not be
-more than 64kiB.
+Google is reached through the discovery-based ``googleapiclient`` by default.
+Installing the ``grpc`` extra allows a Chest to use the ``google-cloud-kms``
+gRPC client and ``google-cloud-storage`` instead.
+
+The design makes no assumptions as to the internal structure of the secret,
+which is handled as ``bytes`` throughout. However, because of the limitations
+of Google KMS, the secret should not be more than 64kiB.
 """
-import base64
+import binascii
+import io
+import json
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
+from urllib.parse import quote
 
+import google.auth
 import googleapiclient.discovery as gcp_discovery
+import httplib2
+from cachetools import TTLCache
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseUpload
-from six.moves import StringIO
+from googleapiclient.http import MediaInMemoryUpload, MediaIoBaseDownload
 
 
 ALETHEIA_CONTENT_TYPE = 'application/x-aletheia-secret'
@@ -26,23 +40,332 @@ ALETHEIA_METADATA_KEY = 'x-aletheia-secret-key'
 
 LOGGER = logging.getLogger(__name__)
 
+CLOUD_PLATFORM_SCOPE = 'https://www.googleapis.com/auth/cloud-platform'
+HTTP_TIMEOUT = 30
+
+# KMS requests carry a single base64 value, so rather than building a dict
+# and running it through the discovery client's JSON model on every call,
+# the value is spliced straight into a prebuilt body.
+KMS_ENDPOINT = 'https://cloudkms.googleapis.com/v1/'
+_KMS_ENCRYPT_TEMPLATE = b'{"plaintext": "%s"}'
+_KMS_DECRYPT_TEMPLATE = b'{"ciphertext": "%s"}'
+_JSON_HEADERS = {'content-type': 'application/json'}
+
+CS_MEDIA_URL = 'https://storage.googleapis.com/storage/v1/b/{}/o/{}?alt=media'
+_CS_METADATA_PREFIX = 'x-goog-meta-'
+
+# Secrets fit comfortably in one request, so by default nothing is chunked.
+# For larger payloads, these chunk sizes have been measured to give the best
+# Cloud Storage throughput from within GCE.
+LARGE_UPLOAD_CHUNKSIZE = 8 * 1024 * 1024
+LARGE_DOWNLOAD_CHUNKSIZE = 1536 * 1024
+
+# Cloud Storage only accepts resumable chunks in multiples of this.
+CHUNKSIZE_MULTIPLE = 256 * 1024
+
+# Building a discovery client downloads and parses the service's discovery
+# document, which costs far more than the request we actually want to make.
+# The underlying httplib2 transport is not thread-safe, so clients are cached
+# per thread rather than shared across the process.
+_CLIENTS = threading.local()
+
+# Downloads for Chest.get_many() run on a shared pool so that its threads,
+# and the clients cached on them, live as long as the process does.
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+MAX_WORKERS = 8
+KMS_BATCH_SIZE = 100
+
+PLAINTEXT_CACHE_SIZE = 1024
+PLAINTEXT_CACHE_TTL = 300
+
+
+def _zeroize(buf):
+    """Overwrite a bytearray in place so the plaintext doesn't linger."""
+    buf[:] = b'\x00' * len(buf)
+
+
+class _PlaintextCache(TTLCache):
+    """A TTL cache of plaintexts that scrubs entries as they leave it.
+
+    Values are stored as private bytearrays so they can be zeroed when they
+    are evicted or expire. Callers only ever receive copies.
+    """
+
+    def popitem(self):
+        key, value = super(_PlaintextCache, self).popitem()
+        _zeroize(value)
+        return key, value
+
+    def expire(self, time=None):
+        expired = super(_PlaintextCache, self).expire(time)
+        for _, value in expired:
+            _zeroize(value)
+        return expired
+
+
+# Decrypted secrets, keyed by (bucket, name, generation). Since Cloud Storage
+# assigns a new generation whenever an object is overwritten, stale entries
+# are simply never looked up again and age out.
+_PLAINTEXT_CACHE = _PlaintextCache(maxsize=PLAINTEXT_CACHE_SIZE,
+                                   ttl=PLAINTEXT_CACHE_TTL)
+_PLAINTEXT_CACHE_LOCK = threading.Lock()
+
+
+def _cache_get(key):
+    """Look up a cached plaintext.
+
+    Args:
+        key (tuple): A (bucket, name, generation) tuple.
+
+    Returns:
+        bytes|None: A copy of the plaintext, or None on a miss.
+    """
+    with _PLAINTEXT_CACHE_LOCK:
+        # Lookups alone never evict, so scrub anything past its TTL here
+        # rather than waiting for the next write.
+        _PLAINTEXT_CACHE.expire()
+        value = _PLAINTEXT_CACHE.get(key)
+        return None if value is None else bytes(value)
+
+
+def _cache_put(key, plaintext):
+    """Store a plaintext in the cache.
+
+    Args:
+        key (tuple): A (bucket, name, generation) tuple.
+        plaintext (bytes): The decrypted secret.
+    """
+    with _PLAINTEXT_CACHE_LOCK:
+        _PLAINTEXT_CACHE.expire()
+        previous = _PLAINTEXT_CACHE.get(key)
+        if previous is not None:
+            _zeroize(previous)
+        _PLAINTEXT_CACHE[key] = bytearray(plaintext)
+
+
+class _LocalCache(object):
+    """The process-wide plaintext cache, behind the same interface as
+    ``SharedSecretCache`` so a chest can consult either one.
+    """
+    get = staticmethod(_cache_get)
+    put = staticmethod(_cache_put)
+
+
+_LOCAL_CACHE = _LocalCache()
+
+
+def _get_http():
+    """Returns this thread's authorized HTTP transport.
+
+    httplib2 keeps a connection open per host, so sharing one transport
+    between both discovery clients on a thread means only the first request
+    to each service pays for the TCP and TLS handshakes.
+
+    Returns:
+        AuthorizedHttp: The transport.
+    """
+    http = getattr(_CLIENTS, 'http', None)
+    if http is None:
+        credentials, _ = google.auth.default(scopes=[CLOUD_PLATFORM_SCOPE])
+        http = _CLIENTS.http = AuthorizedHttp(
+            credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+    return http
+
+
+def _kms_call(url, template, payload):
+    """POST a prebuilt request to Cloud KMS.
+
+    Args:
+        url (str): The full method URL, e.g. ``KMS_ENDPOINT + name +
+            ':encrypt'``.
+        template (bytes): The JSON body, with a ``%s`` for the payload.
+        payload (bytes): The base64 value to splice into the body.
+
+    Returns:
+        dict: The decoded response.
+
+    Raises:
+        HttpError: KMS returned an error.
+    """
+    response, content = _get_http().request(
+        url, 'POST', body=template % payload, headers=_JSON_HEADERS)
+    if response.status >= 300:
+        raise HttpError(response, content, uri=url)
+    return json.loads(content.decode('utf-8'))
+
 
 def get_kms_client():
     """Returns a Google Cloud Key Management Service client.
 
+    The client is built once per thread and reused on subsequent calls.
+    Walking down to the ``cryptoKeys`` resource builds a new Resource at
+    every step, so the result is kept on the client as ``cryptokeys``.
+
     Returns:
       gcp_discovery.Resource: A dynamic client.
     """
-    return gcp_discovery.build('cloudkms', 'v1')
+    client = getattr(_CLIENTS, 'kms', None)
+    if client is None:
+        client = gcp_discovery.build('cloudkms', 'v1', http=_get_http())
+        client.cryptokeys = (
+            client.projects().locations().keyRings().cryptoKeys())
+        _CLIENTS.kms = client
+    return client
 
 
 def get_cs_client():
     """Returns a Google Cloud Storage client.
 
+    The client is built once per thread and reused on subsequent calls.
+
     Returns:
         gcp_discovery.Resource: A dynamic client.
     """
-    return gcp_discovery.build('storage', 'v1')
+    client = getattr(_CLIENTS, 'cs', None)
+    if client is None:
+        client = _CLIENTS.cs = gcp_discovery.build('storage', 'v1',
+                                                   http=_get_http())
+    return client
+
+
+def get_cloud_kms_client():
+    """Returns a Google Cloud Key Management Service gRPC client.
+
+    This requires the optional ``google-cloud-kms`` package. The client is
+    built once per thread and reused on subsequent calls.
+
+    Returns:
+        kms.KeyManagementServiceClient: A gRPC client.
+    """
+    client = getattr(_CLIENTS, 'cloud_kms', None)
+    if client is None:
+        from google.cloud import kms
+        client = _CLIENTS.cloud_kms = kms.KeyManagementServiceClient()
+    return client
+
+
+def get_cloud_storage_client():
+    """Returns a Google Cloud Storage library client.
+
+    This requires the optional ``google-cloud-storage`` package. The client
+    is built once per thread and reused on subsequent calls.
+
+    Returns:
+        storage.Client: A client.
+    """
+    client = getattr(_CLIENTS, 'cloud_storage', None)
+    if client is None:
+        from google.cloud import storage
+        client = _CLIENTS.cloud_storage = storage.Client()
+    return client
+
+
+def _check_chunksize(argument, chunksize):
+    """Make sure a chunk size is one Cloud Storage will accept.
+
+    Args:
+        argument (str): The name of the argument, for the error message.
+        chunksize (int): The chunk size to check.
+
+    Raises:
+        ValueError: The chunk size is neither -1 nor a positive multiple of
+            ``CHUNKSIZE_MULTIPLE``.
+    """
+    if chunksize != -1 and (chunksize <= 0 or
+                            chunksize % CHUNKSIZE_MULTIPLE):
+        raise ValueError(
+            "{} must be -1 or a positive multiple of {}, not {}".format(
+                argument, CHUNKSIZE_MULTIPLE, chunksize))
+
+
+def _blob_chunk_size(chunksize):
+    """Translate a chunk size for ``google-cloud-storage``.
+
+    Args:
+        chunksize (int): A chunk size in bytes, or -1 for no chunking.
+
+    Returns:
+        int|None: The chunk size, or None for no chunking.
+    """
+    return chunksize if chunksize > 0 else None
+
+
+def _generation(blob):
+    """Read a blob's generation the way the JSON API reports it.
+
+    Args:
+        blob (storage.Blob): A blob from ``google-cloud-storage``.
+
+    Returns:
+        str|None: The generation, or None if it isn't known.
+    """
+    return None if blob.generation is None else str(blob.generation)
+
+
+def _get_executor():
+    """Returns the shared thread pool, creating it on first use.
+
+    Returns:
+        ThreadPoolExecutor: The pool.
+    """
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    return _EXECUTOR
+
+
+def _reset_after_fork():
+    """Drop state that a forked child can't safely inherit.
+
+    The pool's worker threads don't survive a fork, so an inherited pool
+    never runs anything again, and a lock held by another thread at the
+    time of the fork stays held forever. Cached clients are dropped too,
+    since their kept-alive connections would otherwise share sockets with
+    the parent.
+    """
+    global _CLIENTS, _EXECUTOR, _EXECUTOR_LOCK, _PLAINTEXT_CACHE_LOCK
+    _CLIENTS = threading.local()
+    _EXECUTOR = None
+    _EXECUTOR_LOCK = threading.Lock()
+    _PLAINTEXT_CACHE_LOCK = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _decrypt_batch(secrets):
+    """Decrypt several secrets with a single batched KMS request.
+
+    Cloud KMS has no bulk decrypt method, so each decrypt call is packed into
+    one HTTP batch request instead. The plaintext is stored on each secret.
+
+    Args:
+        secrets (list): The SimpleSecrets to decrypt, at most
+            ``KMS_BATCH_SIZE`` of them.
+
+    Raises:
+        HttpError: The first decryption that failed, in input order.
+    """
+    responses = {}
+
+    def callback(request_id, response, exception):
+        responses[request_id] = (response, exception)
+
+    kms_client = get_kms_client()
+    batch = kms_client.new_batch_http_request(callback=callback)
+    for index, secret in enumerate(secrets):
+        batch.add(secret._decrypt_request(), request_id=str(index))
+    batch.execute()
+
+    for index, secret in enumerate(secrets):
+        response, exception = responses[str(index)]
+        if exception is not None:
+            raise exception
+        secret._plaintext = secret._remember(
+            binascii.a2b_base64(response['plaintext']))
 
 
 class Chest(object):
@@ -52,48 +375,116 @@ class Chest(object):
     """
 
     def __init__(self, project_id, chest, bucket, location='global',
-                 keyring='aletheia'):
+                 keyring='aletheia', cache_plaintext=False, validate=False,
+                 use_grpc=False, chunksize=-1, download_chunksize=-1,
+                 shared_cache=None):
         """Create a new chest.
 
+        Creating a chest makes no network calls unless ``validate`` is set.
+        Otherwise, access to the key and bucket is checked the first time
+        the chest is actually used.
+
         Args:
             chest (str): The name of the secret chest we want to use. This
                 is often the GCP project ID. It is also the name of the key
                 that should be associated with the secret.
+            cache_plaintext (bool): Keep decrypted secrets in a process-wide
+                cache so repeated lookups skip the KMS decrypt.
+                This trades away the guarantee that plaintext only lives as
+                long as the Secret holding it, so it is off by default.
+            validate (bool): Check access to the key and bucket immediately
+                rather than on first use.
+            use_grpc (bool): Talk to KMS over gRPC with ``google-cloud-kms``,
+                and to Cloud Storage with ``google-cloud-storage``, instead
+                of the discovery clients. Both must be installed, e.g. with
+                the ``grpc`` extra. Secrets are stored identically either
+                way, so the two can be mixed.
+            chunksize (int): Upload in resumable chunks of this many bytes,
+                or -1 to upload in a single request. Secrets limited to
+                KMS's 64kiB never need chunking, but for larger payloads
+                ``LARGE_UPLOAD_CHUNKSIZE`` is a good choice. Chunk sizes
+                must be multiples of ``CHUNKSIZE_MULTIPLE``.
+            download_chunksize (int): Download in chunks of this many bytes,
+                or -1 to download in a single request. This costs an extra
+                metadata request per secret. ``LARGE_DOWNLOAD_CHUNKSIZE`` is
+                a good choice for large payloads. Like ``chunksize``, it
+                must be a multiple of ``CHUNKSIZE_MULTIPLE``.
+            shared_cache (SharedSecretCache|None): Also keep decrypted
+                secrets in this cache, which other processes can read. Like
+                ``cache_plaintext``, this keeps plaintext around beyond the
+                life of a Secret, albeit encrypted.
         Returns:
             Chest: A new chest.
-        """
-        # We want to ensure this key actually exists, and that we have access
-        kms_client = get_kms_client()
 
-        name = 'projects/{}/locations/{}/keyRings/{}/cryptoKeys/{}'.format(
-            project_id, location, keyring, chest)
-        cryptokeys = kms_client.projects().locations().keyRings().cryptoKeys()
-
-        _ = cryptokeys.encrypt(
-            name=name, body={
-                'plaintext': base64.b64encode('THIS IS NOT A SECRET')
-            }
-        ).execute()
-
-        # Now make sure the bucket exists
-        cs_client = get_cs_client()
-
-        try:
-            _ = cs_client.buckets().get(bucket=bucket).execute()
-        except HttpError:
-            raise RuntimeError("Unable to access CS bucket {}".format(bucket))
+        Raises:
+            ValueError: ``chunksize`` or ``download_chunksize`` is invalid.
+            RuntimeError: ``validate`` was set and the bucket could not be
+                accessed.
+        """
+        _check_chunksize('chunksize', chunksize)
+        _check_chunksize('download_chunksize', download_chunksize)
 
-        # Everything looks good, so let's save it
         self.project_id = project_id
         self.chest = chest
         self.bucket = bucket
         self.location = location
         self.keyring = keyring
-        self.keyname = name
+        self.keyname = (
+            'projects/{}/locations/{}/keyRings/{}/cryptoKeys/{}'.format(
+                project_id, location, keyring, chest))
+        self._encrypt_url = KMS_ENDPOINT + self.keyname + ':encrypt'
+        self.cache_plaintext = cache_plaintext
+        self.use_grpc = use_grpc
+        self.chunksize = chunksize
+        self.download_chunksize = download_chunksize
+        self.shared_cache = shared_cache
+        self._validated = False
+
+        # The in-process cache is cheaper to check, so it goes first.
+        caches = []
+        if cache_plaintext:
+            caches.append(_LOCAL_CACHE)
+        if shared_cache is not None:
+            caches.append(shared_cache)
+        self._caches = tuple(caches)
+
+        if validate:
+            self._validate()
 
         super(Chest, self).__init__()
 
-    def get(self, name):
+    def _validate(self):
+        """Make sure the key and bucket exist, and that we have access.
+
+        This only talks to Google the first time it is called.
+
+        Raises:
+            RuntimeError: The bucket could not be accessed.
+        """
+        if self._validated:
+            return
+
+        _ = self._encrypt(b'THIS IS NOT A SECRET')
+
+        # Now make sure the bucket exists
+        if self.use_grpc:
+            from google.api_core.exceptions import GoogleAPICallError
+            try:
+                _ = get_cloud_storage_client().get_bucket(self.bucket)
+            except GoogleAPICallError:
+                raise RuntimeError(
+                    "Unable to access CS bucket {}".format(self.bucket))
+        else:
+            cs_client = get_cs_client()
+            try:
+                _ = cs_client.buckets().get(bucket=self.bucket).execute()
+            except HttpError:
+                raise RuntimeError(
+                    "Unable to access CS bucket {}".format(self.bucket))
+
+        self._validated = True
+
+    def get(self, name: str) -> 'SimpleSecret':
         """Get the provided secret name.
 
         Args:
@@ -105,20 +496,78 @@ class Chest(object):
         Raises:
             ValueError: A ValueError means that a secret with the provided
                 name does not exist.
+            RuntimeError: The chest's bucket could not be accessed.
         """
-        cs_client = get_cs_client()
+        self._validate()
+
+        # The library client needs separate requests for the metadata and
+        # the ciphertext, so fetch both at once. With caching on, the
+        # metadata has to come first so that a hit can skip the download.
+        # The download starts before the generation is known, so it isn't
+        # pinned to it: an object overwritten between the two requests can
+        # pair the old metadata with the new ciphertext. Unless the KMS key
+        # changed too, that just returns the newer secret, which is safe
+        # here only because nothing is cached on this path.
+        if not self.use_grpc or self._caches:
+            return self._fetch(name)
+
+        download = _get_executor().submit(self._download, name)
+        try:
+            return self._fetch(name, download)
+        except Exception as error:
+            # Don't leave the download running, or lose its failure.
+            if not download.cancel():
+                failure = download.exception()
+                if failure is not None and failure is not error:
+                    LOGGER.warning("Download of %s also failed", name,
+                                   exc_info=failure)
+            raise
+
+    def _fetch(self, name, download=None):
+        """Fetch a secret's metadata and ciphertext.
 
-        secret_metadata = cs_client.objects().get(bucket=self.bucket,
-                                                  object=name).execute()
+        Args:
+            name (str): The name of the secret.
+            download (Future|None): A download of the ciphertext that is
+                already in flight, or None to download it once the metadata
+                has been checked.
+
+        Returns:
+            SimpleSecret: A Secret.
+
+        Raises:
+            ValueError: The object is not an Aletheia secret.
+        """
+        if self.use_grpc:
+            secret_metadata = self._get_metadata(name)
+            ciphertext = None
+        else:
+            secret_metadata, ciphertext = self._get_object(name)
 
         # Make sure it's an actual bit of Aletheia data, and that the
         # the associated secret link is there. If it is, grab it.
         if (secret_metadata['contentType'] == ALETHEIA_CONTENT_TYPE and
                 ALETHEIA_METADATA_KEY in secret_metadata['metadata']):
-            request = cs_client.objects().get_media(
-                bucket=self.bucket, object=name)
-            return SimpleSecret(name, request.execute(),
-                                secret_metadata['metadata'][ALETHEIA_METADATA_KEY])
+            kms_keyname = secret_metadata['metadata'][ALETHEIA_METADATA_KEY]
+
+            # The generation is all that invalidates a cached secret when
+            # its object is overwritten, so without one, don't cache at all.
+            generation = secret_metadata['generation']
+            caches = self._caches if generation is not None else ()
+            cache_key = (self.bucket, name, generation)
+            for cache in caches:
+                plaintext = cache.get(cache_key)
+                if plaintext is not None:
+                    return SimpleSecret(name, None, kms_keyname,
+                                        _plaintext=plaintext)
+
+            if ciphertext is None and download is None:
+                ciphertext = self._download(name, generation)
+            elif ciphertext is None:
+                ciphertext = download.result()
+            return SimpleSecret(name, ciphertext, kms_keyname,
+                                _cache_key=cache_key, _caches=caches,
+                                _use_grpc=self.use_grpc)
         else:
             raise ValueError(
                 "{} does not have the correct content type or key set".format(
@@ -126,43 +575,242 @@ class Chest(object):
                 )
             )
 
-    def create(self, name, secret):
+    def _get_object(self, name):
+        """Download a secret along with its object metadata.
+
+        Cloud Storage returns the content type, generation and custom
+        metadata as headers on the media download itself, so a single GET
+        is enough to both check and read the secret.
+
+        Args:
+            name (str): The name of the secret.
+
+        Returns:
+            tuple: The object metadata as a dict shaped like the JSON API
+                resource, with only ``contentType``, ``metadata`` and
+                ``generation`` set, and the stored ciphertext.
+
+        Raises:
+            HttpError: The object could not be downloaded.
+        """
+        if self.download_chunksize > 0:
+            return self._get_object_chunked(name)
+
+        url = CS_MEDIA_URL.format(quote(self.bucket, safe=''),
+                                  quote(name, safe=''))
+        response, content = _get_http().request(url, 'GET')
+        if response.status >= 300:
+            raise HttpError(response, content, uri=url)
+
+        metadata = {
+            header[len(_CS_METADATA_PREFIX):]: value
+            for header, value in response.items()
+            if header.startswith(_CS_METADATA_PREFIX)
+        }
+        return {
+            'contentType': response.get('content-type'),
+            'metadata': metadata,
+            'generation': response.get('x-goog-generation'),
+        }, content
+
+    def _get_object_chunked(self, name):
+        """Download a large secret in chunks, along with its metadata.
+
+        Chunked downloads don't expose the response headers, so the
+        metadata has to be requested separately. The download is pinned to
+        the generation that metadata describes, in case the object is
+        overwritten in between.
+
+        Args:
+            name (str): The name of the secret.
+
+        Returns:
+            tuple: The object metadata and the stored ciphertext, as with
+                ``_get_object``.
+        """
+        objects = get_cs_client().objects()
+        resource = objects.get(bucket=self.bucket, object=name).execute()
+
+        buf = io.BytesIO()
+        downloader = MediaIoBaseDownload(
+            buf, objects.get_media(bucket=self.bucket, object=name,
+                                   generation=resource['generation']),
+            chunksize=self.download_chunksize)
+        done = False
+        while not done:
+            _, done = downloader.next_chunk()
+
+        return {
+            'contentType': resource['contentType'],
+            'metadata': resource.get('metadata', {}),
+            'generation': resource['generation'],
+        }, buf.getvalue()
+
+    def _get_metadata(self, name):
+        """Look up a secret's object metadata with the library client.
+
+        Args:
+            name (str): The name of the secret.
+
+        Returns:
+            dict: The object metadata, shaped like the JSON API resource
+                with only ``contentType``, ``metadata`` and ``generation``
+                set.
+        """
+        blob = get_cloud_storage_client().bucket(self.bucket).blob(name)
+        blob.reload()
+        return {
+            'contentType': blob.content_type,
+            'metadata': blob.metadata or {},
+            'generation': _generation(blob),
+        }
+
+    def _download(self, name, generation=None):
+        """Download a secret's ciphertext with the library client.
+
+        Args:
+            name (str): The name of the secret.
+            generation (str|None): The generation whose metadata was
+                checked, so the download can't pick up a newer version of
+                the object. None downloads whatever is current.
+
+        Returns:
+            bytes: The stored ciphertext.
+        """
+        chunk_size = _blob_chunk_size(self.download_chunksize)
+        if generation is not None:
+            generation = int(generation)
+        bucket = get_cloud_storage_client().bucket(self.bucket)
+        blob = bucket.blob(name, chunk_size=chunk_size, generation=generation)
+        return blob.download_as_bytes()
+
+    def get_many(self, names: List[str]) -> List['SimpleSecret']:
+        """Get several secrets at once, already decrypted.
+
+        The secrets are downloaded concurrently and then decrypted with as
+        few KMS round trips as possible, which is much faster than calling
+        ``get`` for each of them when bootstrapping.
+
+        Args:
+            names (list): The names of the secrets.
+
+        Returns:
+            list: A SimpleSecret for each name, in the same order.
+
+        Raises:
+            ValueError: A secret with one of the names does not exist.
+            HttpError: A secret could not be downloaded or decrypted.
+            RuntimeError: The chest's bucket could not be accessed.
+        """
+        self._validate()
+
+        # Each worker fetches its secret serially, since handing the
+        # download to yet another task on the same pool could deadlock.
+        executor = _get_executor()
+        secrets = list(executor.map(self._fetch, names))
+
+        pending = [secret for secret in secrets if secret._plaintext is None]
+        if self.use_grpc:
+            # gRPC multiplexes concurrent calls over one HTTP/2 connection,
+            # which is what the batch endpoint emulates for discovery.
+            for secret, plaintext in zip(
+                    pending, executor.map(SimpleSecret.decrypt, pending)):
+                secret._plaintext = plaintext
+        else:
+            for start in range(0, len(pending), KMS_BATCH_SIZE):
+                _decrypt_batch(pending[start:start + KMS_BATCH_SIZE])
+
+        return secrets
+
+    def create(self, name: str,
+               secret: Union[bytes, str]) -> 'SimpleSecret':
         """Create a new Secret in the chest.
 
         Args:
             name (str): The name of the secret. Can be path-like.
-            secret (str): The secret itself. It is passed in as a str because
-                it is assumed to be reasonably small, as it's not designed
-                for managing large secrets.
+            secret (bytes|str): The secret itself. It is passed in whole
+                because it is assumed to be reasonably small, as it's not
+                designed for managing large secrets. A str is encoded as
+                UTF-8 first.
 
         Returns:
             SimpleSecret: An initialized secret
+
+        Raises:
+            RuntimeError: The chest's bucket could not be accessed.
         """
-        # First, encrypt it
-        kms_client = get_kms_client()
-        crypto = kms_client.projects().locations().keyRings().cryptoKeys()
-        ciphertext = crypto.encrypt(name=self.keyname, body={
-            'plaintext': base64.b64encode(secret)
-        }).execute()
+        self._validate()
+
+        if isinstance(secret, str):
+            secret = secret.encode('utf-8')
+
+        ciphertext = self._encrypt(secret)
+        generation = self._upload(name, ciphertext)
+
+        if generation is not None:
+            for cache in self._caches:
+                cache.put((self.bucket, name, generation), secret)
+
+        return SimpleSecret(name=name, ciphertext=ciphertext,
+                            kms_keyname=self.keyname, _plaintext=secret,
+                            _use_grpc=self.use_grpc)
+
+    def _encrypt(self, secret):
+        """Encrypt a secret with the chest's key.
+
+        Args:
+            secret (bytes): The plaintext.
 
-        # Now store it
+        Returns:
+            bytes: The base64 ciphertext, which is what gets stored.
+        """
+        if self.use_grpc:
+            response = get_cloud_kms_client().encrypt(name=self.keyname,
+                                                      plaintext=secret)
+            return binascii.b2a_base64(response.ciphertext, newline=False)
+
+        response = _kms_call(self._encrypt_url, _KMS_ENCRYPT_TEMPLATE,
+                             binascii.b2a_base64(secret, newline=False))
+        return response['ciphertext'].encode('ascii')
+
+    def _upload(self, name, ciphertext):
+        """Store a secret's ciphertext in the chest's bucket.
+
+        Args:
+            name (str): The name of the secret.
+            ciphertext (bytes): The base64 ciphertext.
+
+        Returns:
+            str|None: The generation of the newly written object, if known.
+        """
+        metadata = {ALETHEIA_METADATA_KEY: self.keyname}
+
+        if self.use_grpc:
+            bucket = get_cloud_storage_client().bucket(self.bucket)
+            blob = bucket.blob(name,
+                               chunk_size=_blob_chunk_size(self.chunksize))
+            blob.metadata = metadata
+            blob.upload_from_string(ciphertext,
+                                    content_type=ALETHEIA_CONTENT_TYPE)
+            return _generation(blob)
+
+        # Unless chunking was asked for, a single non-resumable upload avoids
+        # the extra round trip needed to open a resumable session.
         cs_client = get_cs_client()
-        cs_client.objects().insert(
+        response = cs_client.objects().insert(
             bucket=self.bucket,
             name=name,
-            media_body=MediaIoBaseUpload(
-                fd=StringIO(ciphertext),
-                mimetype=ALETHEIA_CONTENT_TYPE
+            media_body=MediaInMemoryUpload(
+                ciphertext,
+                mimetype=ALETHEIA_CONTENT_TYPE,
+                chunksize=self.chunksize,
+                resumable=self.chunksize > 0
             ),
             body={
-                'metadata': {
-                    ALETHEIA_METADATA_KEY: self.keyname
-                }
+                'metadata': metadata
             }
         ).execute()
-
-        return SimpleSecret(name=name, ciphertext=ciphertext,
-                            kms_keyname=self.keyname, _plaintext=secret)
+        return response['generation']
 
 
 class SimpleSecret(object):
@@ -171,12 +819,24 @@ class SimpleSecret(object):
     A Secret is where we do most of the work.
 
     Attributes:
-        _ciphertext (str): The local storage copy of the ciphertext
+        _ciphertext (bytes|None): The local storage copy of the ciphertext,
+            or None if the plaintext came straight from the cache.
         _kms_keyname (str): Route in Cloud KMS
-        _plaintext (str|None): Plaintext cache copy of the secret, or
+        _plaintext (bytes|None): Plaintext cache copy of the secret, or
             None if it's not been resolved yet.
+        _cache_key (tuple|None): Where to store the plaintext in the
+            caches once decrypted.
+        _caches (tuple): The caches to store the plaintext in.
+        _use_grpc (bool): Decrypt with the gRPC client instead of the
+            discovery client.
     """
-    def __init__(self, name, ciphertext, kms_keyname, _plaintext=None):
+    __slots__ = ('name', '_ciphertext', '_kms_keyname', '_plaintext',
+                 '_cache_key', '_caches', '_use_grpc')
+
+    def __init__(self, name: str, ciphertext: Optional[bytes],
+                 kms_keyname: str, _plaintext: Optional[bytes] = None,
+                 _cache_key: Optional[tuple] = None, _caches: tuple = (),
+                 _use_grpc: bool = False) -> None:
         """Create a new secret.
 
         Initially, the secret is stored only as encrypted ciphertext. It's
@@ -185,20 +845,26 @@ class SimpleSecret(object):
 
         Args:
             name (str): The name of the secret.
-            ciphertext (str): Encrypted ciphertext.
+            ciphertext (bytes|None): Encrypted ciphertext, as base64.
             kms_keyname (str): "Route" in Cloud KMS
-            _plaintext (str|None): Pre-populated plaintext. This is only used
+            _plaintext (bytes|None): Pre-populated plaintext. This is only used
                 when creating a new Secret from scratch through the Chest.
+            _cache_key (tuple|None): Cache key for the plaintext.
+            _caches (tuple): Caches to store the plaintext in. Only set by a
+                Chest with caching enabled.
+            _use_grpc (bool): Decrypt over gRPC. Only set by a Chest that
+                was itself told to use gRPC.
         """
         self.name = name
         self._ciphertext = ciphertext
         self._kms_keyname = kms_keyname
         self._plaintext = _plaintext
-
-        super(SimpleSecret, self).__init__()
+        self._cache_key = _cache_key
+        self._caches = _caches
+        self._use_grpc = _use_grpc
 
     @property
-    def plaintext(self):
+    def plaintext(self) -> bytes:
         """Return the plaintext version of the secret.
 
         If we don't already have a copy of the plaintext, we will perform the
@@ -210,29 +876,69 @@ class SimpleSecret(object):
         naming it ``plaintext``, we ensure the caller knows what they want.
 
         Returns:
-          str: The plaintext representation of the secret.
+          bytes: The plaintext representation of the secret.
         """
         if self._plaintext is None:
             self._plaintext = self.decrypt()
 
         return self._plaintext
 
-    def decrypt(self):
+    def decrypt(self) -> bytes:
         """Decrypt the secret.
 
         All secrets are stored in base64 format, so we unwrap that first.
 
         Returns:
-          str: The plaintext.
+          bytes: The plaintext.
+
+        Raises:
+          ValueError: There is neither ciphertext nor plaintext to return.
+        """
+        # Secrets served from a cache never had their ciphertext downloaded.
+        if self._ciphertext is None:
+            if self._plaintext is None:
+                raise ValueError(
+                    "{} has no ciphertext to decrypt".format(self.name))
+            return self._plaintext
+
+        if self._use_grpc:
+            response = get_cloud_kms_client().decrypt(
+                name=self._kms_keyname,
+                ciphertext=binascii.a2b_base64(self._ciphertext))
+            return self._remember(response.plaintext)
+
+        # The stored ciphertext is already base64, just as KMS returned it,
+        # so it goes back over the wire without being encoded again.
+        response = _kms_call(KMS_ENDPOINT + self._kms_keyname + ':decrypt',
+                             _KMS_DECRYPT_TEMPLATE, self._ciphertext)
+        return self._remember(binascii.a2b_base64(response['plaintext']))
+
+    def _decrypt_request(self):
+        """Build the discovery request that decrypts this secret.
+
+        This is only needed to add the secret to a batch request.
+
+        Returns:
+          HttpRequest: The unexecuted request.
         """
-        kms_client = get_kms_client()
-        crypto = kms_client.projects().locations().keyRings().cryptoKeys()
-        request = crypto.decrypt(name=self._kms_keyname, body={
-            'ciphertext': self._ciphertext
+        cryptokeys = get_kms_client().cryptokeys
+        return cryptokeys.decrypt(name=self._kms_keyname, body={
+            'ciphertext': self._ciphertext.decode('ascii')
         })
-        response = request.execute()
 
-        return base64.b64decode(response['plaintext'])
+    def _remember(self, plaintext):
+        """Store freshly decrypted plaintext in the caches, if any.
+
+        Args:
+          plaintext (bytes): The plaintext.
+
+        Returns:
+          bytes: The same plaintext.
+        """
+        for cache in self._caches:
+            cache.put(self._cache_key, plaintext)
+
+        return plaintext
 
     def __str__(self):
         """Python string representation.
@@ -0,0 +1,174 @@
+"""Plaintext Cache Shared Between Processes
+
+Decrypting a secret costs a KMS round trip, and the in-process cache in
+:mod:`aletheia.secrets` only helps the process that did the decrypting. For
+pre-forking servers, every worker would otherwise decrypt the same secrets
+again. :class:`SharedSecretCache` keeps plaintexts in a shared memory mapping
+that all of them can read.
+
+Everything written to the mapping is encrypted with AES-GCM under a key that
+only lives in process memory, so the contents of the mapping are useless on
+their own. Entries are keyed by (bucket, name, generation), just like the
+in-process cache, so overwriting a secret in Cloud Storage invalidates it.
+
+This requires the optional ``cryptography`` package, e.g. through the
+``shared-cache`` extra.
+"""
+import hashlib
+import hmac
+import mmap
+import os
+import struct
+import threading
+
+# The most KMS will encrypt, and so the largest secret we'll ever see.
+MAX_SECRET_SIZE = 64 * 1024
+
+_DIGEST_SIZE = hashlib.sha256().digest_size
+_NONCE_SIZE = 12
+_TAG_SIZE = 16
+_LENGTH = struct.Struct('>I')
+_HEADER_SIZE = _DIGEST_SIZE + _LENGTH.size + _NONCE_SIZE
+SLOT_SIZE = _HEADER_SIZE + MAX_SECRET_SIZE + _TAG_SIZE
+
+
+class SharedSecretCache(object):
+    """An encrypted cache of plaintexts shared between processes.
+
+    The cache is a fixed number of slots in a shared memory mapping, each
+    holding at most one secret. A secret's slot is picked by hashing its
+    key, and a newer secret landing in the same slot simply replaces it.
+
+    Writers in different processes are not locked against each other. A
+    reader that sees a half-written slot fails AES-GCM authentication and
+    treats it as a miss, so the worst case is an extra KMS decrypt.
+
+    Processes forked after the cache is created share it automatically. To
+    share it between unrelated processes, give each of them the same
+    ``path``, ``key`` and ``slots``. The slot count isn't stored in the
+    mapping, and processes disagreeing on it would keep overwriting each
+    other's entries.
+    """
+
+    def __init__(self, path=None, key=None, slots=64):
+        """Create or attach to a shared cache.
+
+        Args:
+            path (str|None): A file to map, ideally under ``/dev/shm``. It is
+                created, readable only by its owner, if it doesn't exist. If
+                None, an anonymous mapping is used instead, which is only
+                shared with processes forked from this one. Symlinks and files
+                owned by another user are refused.
+            key (bytes|None): A 256-bit AES key. If None, a fresh key is
+                generated, which again only forked processes will share.
+            slots (int): How many secrets the cache can hold.
+
+        Raises:
+            OSError: ``path`` is a symlink or is owned by another user.
+        """
+        from cryptography.exceptions import InvalidTag
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        if key is None:
+            key = AESGCM.generate_key(bit_length=256)
+
+        self.path = path
+        self.slots = slots
+        self._key = key
+        self._aead = AESGCM(key)
+        self._invalid_tag = InvalidTag
+        self._lock = threading.Lock()
+
+        size = slots * SLOT_SIZE
+        if path is None:
+            self._fd = None
+            self._map = mmap.mmap(-1, size)
+        else:
+            self._fd = os.open(
+                path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+            stat = os.fstat(self._fd)
+            if stat.st_uid != os.getuid():
+                os.close(self._fd)
+                raise OSError(
+                    "{} is owned by another user".format(path))
+            if stat.st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+
+    def _locate(self, key):
+        """Work out where a cache key lives.
+
+        The digest is keyed, so the mapping doesn't reveal secret names.
+
+        Args:
+            key (tuple): A (bucket, name, generation) tuple.
+
+        Returns:
+            tuple: The key's digest and the offset of its slot.
+        """
+        message = '\0'.join(str(part) for part in key).encode('utf-8')
+        digest = hmac.new(self._key, message, hashlib.sha256).digest()
+        slot = int.from_bytes(digest[:8], 'big') % self.slots
+        return digest, slot * SLOT_SIZE
+
+    def get(self, key):
+        """Look up a cached plaintext.
+
+        Args:
+            key (tuple): A (bucket, name, generation) tuple.
+
+        Returns:
+            bytes|None: The plaintext, or None on a miss.
+        """
+        digest, offset = self._locate(key)
+        header = self._map[offset:offset + _HEADER_SIZE]
+        if not hmac.compare_digest(header[:_DIGEST_SIZE], digest):
+            return None
+
+        length, = _LENGTH.unpack_from(header, _DIGEST_SIZE)
+        if length > MAX_SECRET_SIZE + _TAG_SIZE:
+            return None
+        nonce = header[_DIGEST_SIZE + _LENGTH.size:]
+        start = offset + _HEADER_SIZE
+        ciphertext = self._map[start:start + length]
+
+        try:
+            return self._aead.decrypt(nonce, ciphertext, digest)
+        except self._invalid_tag:
+            return None
+
+    def put(self, key, plaintext):
+        """Store a plaintext in the cache.
+
+        Secrets too large for a slot are silently not cached.
+
+        Args:
+            key (tuple): A (bucket, name, generation) tuple.
+            plaintext (bytes): The decrypted secret.
+        """
+        if len(plaintext) > MAX_SECRET_SIZE:
+            return
+
+        digest, offset = self._locate(key)
+        nonce = os.urandom(_NONCE_SIZE)
+        ciphertext = self._aead.encrypt(nonce, plaintext, digest)
+
+        with self._lock:
+            # Clear the digest first, so the slot never claims to hold the
+            # new key while it still holds the old value.
+            self._map[offset:offset + _DIGEST_SIZE] = bytes(_DIGEST_SIZE)
+            start = offset + _DIGEST_SIZE
+            self._map[start:start + _LENGTH.size] = _LENGTH.pack(
+                len(ciphertext))
+            start += _LENGTH.size
+            self._map[start:start + _NONCE_SIZE] = nonce
+            start += _NONCE_SIZE
+            self._map[start:start + len(ciphertext)] = ciphertext
+            self._map[offset:offset + _DIGEST_SIZE] = digest
+
+    def close(self):
+        """Unmap the cache. The backing file, if any, is left in place."""
+        self._map.close()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -9,10 +9,23 @@ with open('HISTORY.rst') as history_file:
 
 requirements = [
     'Click>=6.0',
-    'google-api-python-client>=1.6',
-    'six>=1.10',
+    'cachetools>=5.5',
+    'google-api-python-client>=2.0',
+    'google-auth>=1.0',
+    'google-auth-httplib2>=0.0.3',
+    'httplib2>=0.9',
 ]
 
+extras_requirements = {
+    'grpc': [
+        'google-cloud-kms>=1.0',
+        'google-cloud-storage>=1.32',
+    ],
+    'shared-cache': [
+        'cryptography>=2.0',
+    ],
+}
+
 test_requirements = [
     'pytest>=3.0',
     'pytest-mock>=1.6',
@@ -38,7 +51,9 @@ setup(
         ],
     },
     include_package_data=True,
+    python_requires='>=3.7',
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="BSD license",
     zip_safe=False,
     keywords='aletheia',
@@ -47,9 +62,7 @@ setup(
         'Intended Audience :: Developers',
         'License :: OSI Approved :: BSD License',
         'Natural Language :: English',
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
     ],
     test_suite='tests',
     tests_require=test_requirements,
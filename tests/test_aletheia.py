@@ -8,12 +8,16 @@ test_aletheia
 Tests for `aletheia` module.
 """
 
+import os
+
+import httplib2
 import pytest
 
 from contextlib import contextmanager
 from click.testing import CliRunner
 
 from aletheia import secrets
+from aletheia import shared_cache
 from aletheia import cli
 
 
@@ -40,3 +44,569 @@ def test_command_line_interface():
     help_result = runner.invoke(cli.main, ['--help'])
     assert help_result.exit_code == 0
     assert '--help  Show this message and exit.' in help_result.output
+
+
+@pytest.fixture
+def discovery(mocker):
+    """Replace the discovery builder and drop any clients already cached."""
+    mocker.patch.object(secrets, '_CLIENTS', secrets.threading.local())
+    mocker.patch.object(secrets.google.auth, 'default',
+                        return_value=(mocker.Mock(), 'project'))
+    return mocker.patch.object(secrets.gcp_discovery, 'build')
+
+
+def test_clients_are_cached(discovery):
+    assert secrets.get_kms_client() is secrets.get_kms_client()
+    assert secrets.get_cs_client() is secrets.get_cs_client()
+    assert discovery.call_count == 2
+
+
+def test_clients_share_http_per_thread(discovery):
+    secrets.get_kms_client()
+    secrets.get_cs_client()
+    kms_http = discovery.call_args_list[0][1]['http']
+    cs_http = discovery.call_args_list[1][1]['http']
+    assert kms_http is cs_http
+    assert isinstance(kms_http, secrets.AuthorizedHttp)
+
+
+def test_plaintext_cache_zeroizes_evicted_entries():
+    cache = secrets._PlaintextCache(maxsize=1, ttl=60)
+    cache['a'] = value = bytearray(b'hunter2')
+    cache['b'] = bytearray(b'swordfish')
+    assert 'a' not in cache
+    assert value == bytearray(len(b'hunter2'))
+
+
+def test_plaintext_cache_returns_copies(mocker):
+    mocker.patch.object(secrets, '_PLAINTEXT_CACHE',
+                        secrets._PlaintextCache(maxsize=4, ttl=60))
+    key = ('bucket', 'name', '1')
+    assert secrets._cache_get(key) is None
+    secrets._cache_put(key, b'hunter2')
+    assert secrets._cache_get(key) == b'hunter2'
+    assert not isinstance(secrets._cache_get(key), bytearray)
+
+
+class FakeBatch(object):
+    """Stand-in for BatchHttpRequest that answers each request in order."""
+
+    def __init__(self, callback, results):
+        self.callback = callback
+        self.results = results
+        self.request_ids = []
+
+    def add(self, request, request_id):
+        self.request_ids.append(request_id)
+
+    def execute(self):
+        for request_id, (response, exception) in zip(self.request_ids,
+                                                     self.results):
+            self.callback(request_id, response, exception)
+
+
+def test_decrypt_batch(mocker):
+    kms = mocker.patch.object(secrets, 'get_kms_client').return_value
+    kms.new_batch_http_request.side_effect = lambda callback: FakeBatch(
+        callback, [({'plaintext': 'b25l'}, None),
+                   ({'plaintext': 'dHdv'}, None)])
+    batch = [secrets.SimpleSecret('one', b'ct1', 'key'),
+             secrets.SimpleSecret('two', b'ct2', 'key')]
+
+    secrets._decrypt_batch(batch)
+
+    assert [secret.plaintext for secret in batch] == [b'one', b'two']
+
+
+def test_decrypt_batch_raises_first_failure(mocker):
+    kms = mocker.patch.object(secrets, 'get_kms_client').return_value
+    kms.new_batch_http_request.side_effect = lambda callback: FakeBatch(
+        callback, [({'plaintext': 'b25l'}, None),
+                   (None, KeyError('two')),
+                   (None, KeyError('three'))])
+    batch = [secrets.SimpleSecret(name, b'ct', 'key')
+             for name in ('one', 'two', 'three')]
+
+    with pytest.raises(KeyError, match='two'):
+        secrets._decrypt_batch(batch)
+
+
+def test_chest_validates_lazily(discovery, mocker):
+    kms_call = mocker.patch.object(secrets, '_kms_call',
+                                   return_value={'ciphertext': 'Y3Q='})
+    chest = secrets.Chest('project', 'chest', 'bucket')
+    assert not discovery.called
+    assert not kms_call.called
+
+    chest._validate()
+    chest._validate()
+
+    assert kms_call.call_count == 1
+    discovery.return_value.buckets().get.assert_called_once_with(
+        bucket='bucket')
+
+
+def test_chest_validates_eagerly(discovery, mocker):
+    mocker.patch.object(secrets, '_kms_call',
+                        return_value={'ciphertext': 'Y3Q='})
+    client = discovery.return_value
+    client.buckets().get().execute.side_effect = secrets.HttpError(
+        httplib2.Response({'status': 403}), b'')
+    with pytest.raises(RuntimeError):
+        secrets.Chest('project', 'chest', 'bucket', validate=True)
+
+
+def test_get_reads_metadata_from_media_headers(mocker):
+    http = mocker.patch.object(secrets, '_get_http').return_value
+    http.request.return_value = (httplib2.Response({
+        'status': 200,
+        'content-type': secrets.ALETHEIA_CONTENT_TYPE,
+        'x-goog-generation': '1',
+        'x-goog-meta-' + secrets.ALETHEIA_METADATA_KEY: 'key',
+    }), b'ciphertext')
+    chest = secrets.Chest('project', 'chest', 'bucket')
+    chest._validated = True
+
+    secret = chest.get('path/name')
+
+    assert secret._ciphertext == b'ciphertext'
+    assert secret._kms_keyname == 'key'
+    http.request.assert_called_once_with(
+        'https://storage.googleapis.com/storage/v1/b/bucket/o/'
+        'path%2Fname?alt=media', 'GET')
+
+
+def test_get_rejects_foreign_objects(mocker):
+    http = mocker.patch.object(secrets, '_get_http').return_value
+    http.request.return_value = (httplib2.Response({
+        'status': 200, 'content-type': 'text/plain'}), b'hello')
+    chest = secrets.Chest('project', 'chest', 'bucket')
+    chest._validated = True
+
+    with pytest.raises(ValueError):
+        chest.get('name')
+
+
+def test_grpc_round_trip(mocker):
+    kms = mocker.patch.object(secrets, 'get_cloud_kms_client').return_value
+    kms.encrypt.return_value.ciphertext = b'\x00raw'
+    kms.decrypt.return_value.plaintext = b'hunter2'
+    storage = mocker.patch.object(secrets, 'get_cloud_storage_client')
+    blob = storage.return_value.bucket.return_value.blob.return_value
+    blob.generation = 7
+    chest = secrets.Chest('project', 'chest', 'bucket', use_grpc=True)
+    chest._validated = True
+
+    created = chest.create('name', b'hunter2')
+
+    assert created._ciphertext == b'AHJhdw=='
+    blob.upload_from_string.assert_called_once_with(
+        b'AHJhdw==', content_type=secrets.ALETHEIA_CONTENT_TYPE)
+    assert blob.metadata == {secrets.ALETHEIA_METADATA_KEY: chest.keyname}
+
+    secret = secrets.SimpleSecret('name', created._ciphertext, chest.keyname,
+                                  _use_grpc=True)
+    assert secret.plaintext == b'hunter2'
+    kms.decrypt.assert_called_once_with(name=chest.keyname,
+                                        ciphertext=b'\x00raw')
+
+
+def test_secret_has_no_instance_dict():
+    secret = secrets.SimpleSecret('name', b'ciphertext', 'key')
+    assert not hasattr(secret, '__dict__')
+
+
+def test_create_encodes_str_secrets(mocker):
+    chest = secrets.Chest('project', 'chest', 'bucket')
+    chest._validated = True
+    encrypt = mocker.patch.object(chest, '_encrypt', return_value=b'Y3Q=')
+    mocker.patch.object(chest, '_upload', return_value='1')
+
+    secret = chest.create('name', u'h\xfcnter2')
+
+    encrypt.assert_called_once_with(b'h\xc3\xbcnter2')
+    assert secret.plaintext == b'h\xc3\xbcnter2'
+
+
+def test_kms_requests_use_prebuilt_bodies(mocker):
+    http = mocker.patch.object(secrets, '_get_http').return_value
+    http.request.return_value = (httplib2.Response({'status': 200}),
+                                 b'{"ciphertext": "Y3Q="}')
+    chest = secrets.Chest('project', 'chest', 'bucket')
+
+    assert chest._encrypt(b'hunter2') == b'Y3Q='
+    http.request.assert_called_once_with(
+        secrets.KMS_ENDPOINT + chest.keyname + ':encrypt', 'POST',
+        body=b'{"plaintext": "aHVudGVyMg=="}',
+        headers={'content-type': 'application/json'})
+
+    http.request.return_value = (httplib2.Response({'status': 200}),
+                                 b'{"plaintext": "aHVudGVyMg=="}')
+    secret = secrets.SimpleSecret('name', b'Y3Q=', chest.keyname)
+    assert secret.plaintext == b'hunter2'
+    assert http.request.call_args[1]['body'] == b'{"ciphertext": "Y3Q="}'
+
+
+def test_kms_errors_are_raised(mocker):
+    http = mocker.patch.object(secrets, '_get_http').return_value
+    http.request.return_value = (httplib2.Response({'status': 403}), b'{}')
+    secret = secrets.SimpleSecret('name', b'Y3Q=', 'key')
+    with pytest.raises(secrets.HttpError):
+        secret.decrypt()
+
+
+@pytest.mark.parametrize('chunksize, resumable', [(-1, False),
+                                                  (8 * 1024 * 1024, True)])
+def test_upload_chunking(discovery, chunksize, resumable):
+    insert = discovery.return_value.objects().insert
+    insert().execute.return_value = {'generation': '1'}
+    chest = secrets.Chest('project', 'chest', 'bucket', chunksize=chunksize)
+
+    chest._upload('name', b'Y3Q=')
+
+    media = insert.call_args[1]['media_body']
+    assert media.resumable() is resumable
+    assert media.chunksize() == chunksize
+
+
+def test_shared_cache_round_trip(tmpdir):
+    key = b'k' * 32
+    path = str(tmpdir.join('cache'))
+    writer = shared_cache.SharedSecretCache(path=path, key=key, slots=4)
+    reader = shared_cache.SharedSecretCache(path=path, key=key, slots=4)
+
+    writer.put(('bucket', 'name', '1'), b'hunter2')
+
+    assert reader.get(('bucket', 'name', '1')) == b'hunter2'
+    assert reader.get(('bucket', 'name', '2')) is None
+    with open(path, 'rb') as mapped:
+        assert b'hunter2' not in mapped.read()
+
+
+def test_shared_cache_rejects_other_keys_and_tampering(tmpdir):
+    path = str(tmpdir.join('cache'))
+    cache = shared_cache.SharedSecretCache(path=path, slots=1)
+    cache.put(('bucket', 'name', '1'), b'hunter2')
+
+    other = shared_cache.SharedSecretCache(path=path, slots=1)
+    assert other.get(('bucket', 'name', '1')) is None
+
+    cache._map[shared_cache._HEADER_SIZE] ^= 0xff
+    assert cache.get(('bucket', 'name', '1')) is None
+
+
+def test_shared_cache_refuses_symlinks_and_other_owners(tmpdir, mocker):
+    target = tmpdir.join('target')
+    target.write('')
+    link = tmpdir.join('link')
+    link.mksymlinkto(target)
+    with pytest.raises(OSError):
+        shared_cache.SharedSecretCache(path=str(link), slots=1)
+
+    mocker.patch.object(os, 'getuid', return_value=os.getuid() + 1)
+    with pytest.raises(OSError):
+        shared_cache.SharedSecretCache(path=str(target), slots=1)
+
+
+def test_get_uses_shared_cache(mocker):
+    http = mocker.patch.object(secrets, '_get_http').return_value
+    http.request.return_value = (httplib2.Response({
+        'status': 200,
+        'content-type': secrets.ALETHEIA_CONTENT_TYPE,
+        'x-goog-generation': '1',
+        'x-goog-meta-' + secrets.ALETHEIA_METADATA_KEY: 'key',
+    }), b'Y3Q=')
+    cache = shared_cache.SharedSecretCache(slots=4)
+    cache.put(('bucket', 'name', '1'), b'hunter2')
+    chest = secrets.Chest('project', 'chest', 'bucket', shared_cache=cache)
+    chest._validated = True
+
+    assert chest.get('name').plaintext == b'hunter2'
+    assert http.request.call_count == 1
+
+
+def test_plaintext_cache_zeroizes_expired_entries():
+    now = [0]
+    cache = secrets._PlaintextCache(maxsize=4, ttl=10, timer=lambda: now[0])
+    cache['a'] = value = bytearray(b'hunter2')
+    now[0] = 20
+    cache.expire()
+    assert value == bytearray(len(b'hunter2'))
+
+
+def test_cache_put_zeroizes_replaced_value(mocker):
+    cache = secrets._PlaintextCache(maxsize=4, ttl=60)
+    mocker.patch.object(secrets, '_PLAINTEXT_CACHE', cache)
+    key = ('bucket', 'name', '1')
+    secrets._cache_put(key, b'hunter2')
+    old = cache[key]
+    secrets._cache_put(key, b'swordfish')
+    assert old == bytearray(len(b'hunter2'))
+    assert secrets._cache_get(key) == b'swordfish'
+
+
+def test_decrypt_cached_secret():
+    secret = secrets.SimpleSecret('name', None, 'key', _plaintext=b'hunter2')
+    assert secret.decrypt() == b'hunter2'
+
+    with pytest.raises(ValueError):
+        secrets.SimpleSecret('name', None, 'key').decrypt()
+
+
+@pytest.fixture
+def many_chest(mocker):
+    """A chest whose fetches are faked, with 'cached' already decrypted."""
+    def fetch(name):
+        plaintext = b'cached' if name == 'cached' else None
+        return secrets.SimpleSecret(name, b'Y3Q=', 'key',
+                                    _plaintext=plaintext)
+
+    def build(**kwargs):
+        chest = secrets.Chest('project', 'chest', 'bucket', **kwargs)
+        mocker.patch.object(chest, '_validate')
+        mocker.patch.object(chest, '_fetch', side_effect=fetch)
+        return chest
+
+    return build
+
+
+def test_get_many(mocker, many_chest):
+    def decrypt_batch(batch):
+        for secret in batch:
+            secret._plaintext = secret.name.encode('ascii')
+
+    batches = mocker.patch.object(secrets, '_decrypt_batch',
+                                  side_effect=decrypt_batch)
+    chest = many_chest()
+    names = ['one', 'cached', 'two', 'three']
+
+    result = chest.get_many(names)
+
+    chest._validate.assert_called_once_with()
+    assert [secret.name for secret in result] == names
+    assert [secret.plaintext for secret in result] == [
+        b'one', b'cached', b'two', b'three']
+    assert batches.call_count == 1
+    assert [secret.name for secret in batches.call_args[0][0]] == [
+        'one', 'two', 'three']
+
+
+def test_get_many_grpc(mocker, many_chest):
+    batches = mocker.patch.object(secrets, '_decrypt_batch')
+    decrypt = mocker.patch.object(
+        secrets.SimpleSecret, 'decrypt', autospec=True,
+        side_effect=lambda secret: secret.name.encode('ascii'))
+    chest = many_chest(use_grpc=True)
+
+    result = chest.get_many(['one', 'cached', 'two'])
+
+    chest._validate.assert_called_once_with()
+    assert [secret.plaintext for secret in result] == [
+        b'one', b'cached', b'two']
+    assert sorted(call[0][0].name for call in decrypt.call_args_list) == [
+        'one', 'two']
+    assert not batches.called
+
+
+def test_grpc_get_waits_for_download_on_failure(mocker):
+    storage = mocker.patch.object(secrets, 'get_cloud_storage_client')
+    blob = storage.return_value.bucket.return_value.blob.return_value
+    blob.content_type = 'text/plain'
+    blob.metadata = {}
+    blob.generation = 1
+    started = secrets.threading.Event()
+
+    def download():
+        started.set()
+        raise KeyError('download')
+
+    # Hold the metadata back until the download is running, so that it can
+    # no longer be cancelled.
+    blob.reload.side_effect = lambda: started.wait(5)
+    blob.download_as_bytes.side_effect = download
+    warning = mocker.patch.object(secrets.LOGGER, 'warning')
+    chest = secrets.Chest('project', 'chest', 'bucket', use_grpc=True)
+    chest._validated = True
+
+    with pytest.raises(ValueError):
+        chest.get('name')
+
+    assert isinstance(warning.call_args[1]['exc_info'], KeyError)
+
+
+def test_get_without_generation_skips_caches(mocker):
+    http = mocker.patch.object(secrets, '_get_http').return_value
+    http.request.return_value = (httplib2.Response({
+        'status': 200,
+        'content-type': secrets.ALETHEIA_CONTENT_TYPE,
+        'x-goog-meta-' + secrets.ALETHEIA_METADATA_KEY: 'key',
+    }), b'Y3Q=')
+    cache = mocker.Mock()
+    chest = secrets.Chest('project', 'chest', 'bucket', shared_cache=cache)
+    chest._validated = True
+
+    secret = chest.get('name')
+
+    assert not cache.get.called
+    assert secret._caches == ()
+
+
+def test_chunked_download(discovery, mocker):
+    class FakeDownload(object):
+        """Writes the ciphertext in two chunks."""
+
+        def __init__(self, fd, request, chunksize):
+            self.fd = fd
+            self.chunks = [b'Y3', b'Q=']
+            assert chunksize == secrets.LARGE_DOWNLOAD_CHUNKSIZE
+
+        def next_chunk(self):
+            self.fd.write(self.chunks.pop(0))
+            return None, not self.chunks
+
+    mocker.patch.object(secrets, 'MediaIoBaseDownload', FakeDownload)
+    objects = discovery.return_value.objects()
+    objects.get().execute.return_value = {
+        'contentType': secrets.ALETHEIA_CONTENT_TYPE,
+        'metadata': {secrets.ALETHEIA_METADATA_KEY: 'key'},
+        'generation': '7',
+    }
+    chest = secrets.Chest(
+        'project', 'chest', 'bucket',
+        download_chunksize=secrets.LARGE_DOWNLOAD_CHUNKSIZE)
+    chest._validated = True
+
+    secret = chest.get('name')
+
+    assert secret._ciphertext == b'Y3Q='
+    assert secret._kms_keyname == 'key'
+    objects.get_media.assert_called_once_with(bucket='bucket', object='name',
+                                              generation='7')
+
+
+def test_cache_get_zeroizes_expired_entries(mocker):
+    now = [0]
+    cache = secrets._PlaintextCache(maxsize=4, ttl=10, timer=lambda: now[0])
+    mocker.patch.object(secrets, '_PLAINTEXT_CACHE', cache)
+    key = ('bucket', 'name', '1')
+    secrets._cache_put(key, b'hunter2')
+    value = cache[key]
+
+    now[0] = 20
+    assert secrets._cache_get(key) is None
+    assert value == bytearray(len(b'hunter2'))
+
+
+def test_get_uses_plaintext_cache(mocker):
+    mocker.patch.object(secrets, '_PLAINTEXT_CACHE',
+                        secrets._PlaintextCache(maxsize=4, ttl=60))
+    http = mocker.patch.object(secrets, '_get_http').return_value
+    http.request.return_value = (httplib2.Response({
+        'status': 200,
+        'content-type': secrets.ALETHEIA_CONTENT_TYPE,
+        'x-goog-generation': '1',
+        'x-goog-meta-' + secrets.ALETHEIA_METADATA_KEY: 'key',
+    }), b'Y3Q=')
+    kms_call = mocker.patch.object(secrets, '_kms_call',
+                                   return_value={'plaintext': 'aHVudGVyMg=='})
+    chest = secrets.Chest('project', 'chest', 'bucket', cache_plaintext=True)
+    chest._validated = True
+
+    assert chest.get('name').plaintext == b'hunter2'
+    assert chest.get('name').plaintext == b'hunter2'
+    assert kms_call.call_count == 1
+
+    # Overwriting the object gives it a new generation, which misses.
+    http.request.return_value[0]['x-goog-generation'] = '2'
+    assert chest.get('name').plaintext == b'hunter2'
+    assert kms_call.call_count == 2
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork()')
+def test_executor_works_after_fork():
+    assert secrets._get_executor().submit(lambda: 1).result(timeout=3) == 1
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            result = secrets._get_executor().submit(lambda: 2).result(
+                timeout=3)
+            os._exit(0 if result == 2 else 1)
+        except BaseException:
+            os._exit(1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+
+def test_grpc_get_downloads_alongside_metadata(mocker):
+    storage = mocker.patch.object(secrets, 'get_cloud_storage_client')
+    blob = storage.return_value.bucket.return_value.blob.return_value
+    blob.content_type = secrets.ALETHEIA_CONTENT_TYPE
+    blob.metadata = {secrets.ALETHEIA_METADATA_KEY: 'key'}
+    blob.generation = 1
+    blob.download_as_bytes.return_value = b'Y3Q='
+    chest = secrets.Chest('project', 'chest', 'bucket', use_grpc=True)
+    chest._validated = True
+
+    secret = chest.get('name')
+
+    assert secret._ciphertext == b'Y3Q='
+    assert secret._kms_keyname == 'key'
+    assert secret._use_grpc
+    blob.reload.assert_called_once_with()
+    blob.download_as_bytes.assert_called_once_with()
+
+
+def test_grpc_get_pins_download_to_checked_generation(mocker):
+    storage = mocker.patch.object(secrets, 'get_cloud_storage_client')
+    bucket = storage.return_value.bucket.return_value
+    blob = bucket.blob.return_value
+    blob.content_type = secrets.ALETHEIA_CONTENT_TYPE
+    blob.metadata = {secrets.ALETHEIA_METADATA_KEY: 'key'}
+    blob.generation = 7
+    blob.download_as_bytes.return_value = b'Y3Q='
+    cache = mocker.Mock()
+    cache.get.return_value = None
+    chest = secrets.Chest('project', 'chest', 'bucket', use_grpc=True,
+                          shared_cache=cache)
+    chest._validated = True
+
+    secret = chest.get('name')
+
+    assert secret._ciphertext == b'Y3Q='
+    cache.get.assert_called_once_with(('bucket', 'name', '7'))
+    bucket.blob.assert_called_with('name', chunk_size=None, generation=7)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork()')
+def test_clients_are_not_inherited_across_fork(discovery):
+    parent = secrets.get_kms_client()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os._exit(0 if getattr(secrets._CLIENTS, 'kms', None) is None
+                     else 1)
+        except BaseException:
+            os._exit(1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    assert secrets.get_kms_client() is parent
+
+
+@pytest.mark.parametrize('argument', ['chunksize', 'download_chunksize'])
+@pytest.mark.parametrize('chunksize', [0, -2, 1000, 256 * 1024 + 1])
+def test_invalid_chunksize(argument, chunksize):
+    with pytest.raises(ValueError):
+        secrets.Chest('project', 'chest', 'bucket', **{argument: chunksize})
+
+
+@pytest.mark.parametrize('chunksize', [-1, 256 * 1024,
+                                       secrets.LARGE_UPLOAD_CHUNKSIZE,
+                                       secrets.LARGE_DOWNLOAD_CHUNKSIZE])
+def test_valid_chunksize(chunksize):
+    chest = secrets.Chest('project', 'chest', 'bucket', chunksize=chunksize,
+                          download_chunksize=chunksize)
+    assert chest.chunksize == chest.download_chunksize == chunksize